@@ -1,13 +1,102 @@
 #!/usr/bin/env python
 import argparse
+import collections
 import csv
+import functools
+import io
+import itertools
+import operator
 import json
 import os
 import sqlite3
 import sys
+import tempfile
 import urllib.parse
 import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+try:
+    # orjson is an optional speedup for decoding pages and encoding attributes
+    import orjson
+
+    def json_dumps(value):
+        return orjson.dumps(value).decode()
+
+    json_loads = orjson.loads
+except ImportError:
+    # Match orjson's compact UTF-8 output so exports don't depend on the extra
+    json_dumps = functools.partial(
+        json.dumps, separators=(",", ":"), ensure_ascii=False
+    )
+    json_loads = json.loads
+
+try:
+    # requests-cache is optional; without it every run fetches from the API
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+# Attribute value types stored as JSON strings. Decoded JSON only contains
+# exact list/dict instances, so a set lookup can replace isinstance()
+_COMPLEX_TYPES = frozenset((list, dict))
+
+
+def _bounded_map(executor, fn, iterable, window):
+    """
+    Like executor.map, but with at most `window` calls in flight.
+
+    Work is only submitted as results are consumed, so a slow consumer
+    doesn't leave completed results piling up in memory. Results are
+    yielded in input order; pending calls are cancelled if the consumer
+    stops early.
+    """
+    pending = collections.deque()
+    try:
+        for item in iterable:
+            if len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(executor.submit(fn, item))
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _row_builder(sorted_fields):
+    """Return a function that builds a grant's output row tuple, in column order."""
+    columns = ("id", *sorted_fields)
+    template = dict.fromkeys(columns)
+
+    # itemgetter returns a bare value rather than a tuple for a single key
+    if sorted_fields:
+        get_row = operator.itemgetter(*columns)
+    else:
+        get_row = lambda row: (row["id"],)
+
+    def build_row(grant):
+        row = template.copy()
+        attributes = grant.get("attributes", {})
+        row.update(attributes)
+        for key, value in attributes.items():
+            # Convert lists and dictionaries to JSON strings
+            if value.__class__ in _COMPLEX_TYPES:
+                row[key] = json_dumps(value)
+        row["id"] = grant.get("id", "")
+        return get_row(row)
+
+    return build_row
+
+
+def _serialize_chunk(sorted_fields, chunk):
+    """Serialize grant records to CSV text without a header, in a worker process."""
+    buffer = io.StringIO(newline="")
+    csv.writer(buffer).writerows(map(_row_builder(sorted_fields), chunk))
+    return buffer.getvalue()
 
 
 class ARCGrantsAPI:
@@ -15,9 +104,71 @@ class ARCGrantsAPI:
 
     BASE_URL = "https://dataportal.arc.gov.au/NCGP/API/grants"
 
-    def __init__(self):
+    # Cached responses are kept next to this script, whichever directory it
+    # is run from; requests-cache adds the .sqlite extension
+    CACHE_NAME = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "arc_api_cache"
+    )
+
+    # Number of pages requested from the API at the same time
+    MAX_CONCURRENT_REQUESTS = 8
+
+    # CSV-only exports of at least this many records are serialized across
+    # processes, in chunks of up to CSV_POOL_CHUNK_SIZE records. Starting
+    # the workers with the default start method costs about 0.04s, against
+    # about 0.2s to export this many records serially
+    CSV_POOL_THRESHOLD = 5000
+    CSV_POOL_CHUNK_SIZE = 2000
+
+    def __init__(self, use_cache=True, cache_ttl=86400):
+        """
+        Args:
+            use_cache: Cache API responses on disk when requests-cache is installed
+            cache_ttl: Number of seconds cached responses are reused for
+        """
         self.results = []
 
+        # Share one session so connections are kept alive between pages,
+        # retrying transient errors and rate limiting with backoff
+        if use_cache and requests_cache is not None:
+            # Responses are cached by full URL, so repeating a query skips the API
+            self.session = requests_cache.CachedSession(
+                self.CACHE_NAME, backend="sqlite", expire_after=cache_ttl
+            )
+        else:
+            self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_maxsize=self.MAX_CONCURRENT_REQUESTS,
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Ask for compressed JSON; brotli is only advertised when installed
+        accept_encoding = make_headers(accept_encoding=True)["accept-encoding"]
+        self.session.headers.update(
+            {
+                "Accept": "application/json",
+                "Accept-Encoding": accept_encoding,
+                "User-Agent": "arc-grant-search/0.1.0",
+            }
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the underlying HTTP session."""
+        self.session.close()
+
     def build_filter_query(
         self,
         search_text=None,
@@ -90,6 +241,137 @@ class ARCGrantsAPI:
         else:
             return query_text
 
+    def _build_page_url_prefix(self, filter_query=None, page_size=100):
+        """
+        Build the request URL up to the page number.
+
+        Only the page number changes between requests, so the (possibly
+        long) filter query is encoded once per fetch rather than per page.
+        """
+        # Construct URL manually
+        url = f"{self.BASE_URL}?page%5Bsize%5D={min(page_size, 1000)}"
+
+        if filter_query:
+            # Percent-encode the filter parameter, with spaces as %20
+            url = f"{url}&filter={urllib.parse.quote(filter_query, safe='')}"
+
+        return f"{url}&page%5Bnumber%5D="
+
+    def _fetch_page(self, page, url_prefix):
+        """
+        Fetch a single page of grants from the ARC API.
+
+        Pages are fetched on worker threads, so rather than printing,
+        messages are returned for the caller to print in page order.
+
+        Returns:
+            Tuple of the decoded JSON response (None if the request failed
+            or the response contained no data) and a list of messages
+        """
+        url = f"{url_prefix}{page}"
+        messages = [f"Request URL: {url}"]
+
+        # Make request with the manually constructed URL; transient errors
+        # have already been retried by the session's adapter
+        response = None
+        try:
+            response = self.session.get(url, timeout=(5, 60))
+            response.raise_for_status()
+            data = json_loads(response.content)
+        except (requests.RequestException, ValueError) as e:
+            messages.append(f"Error fetching page {page}: {e}")
+            # No response if the request failed before the server replied
+            if response is not None:
+                if response.status_code in (401, 403):
+                    messages.append("Authentication error or API access denied.")
+                elif response.status_code == 500:
+                    messages.append("Server error. Check your query parameters.")
+                    if hasattr(response, "text"):
+                        messages.append(f"Response: {response.text[:500]}...")
+                elif response.status_code >= 400:
+                    messages.append(f"HTTP error: {response.status_code}")
+            return None, messages
+
+        if "data" not in data:
+            messages.append(f"No data found in response for page {page}.")
+            messages.append(
+                f"Response: {json.dumps(data, indent=2)[:500]}..."
+            )  # Print truncated response
+            return None, messages
+
+        if getattr(response, "from_cache", False):
+            messages.append(
+                f"Page {page} served from cache (use --no-cache to refetch)"
+            )
+
+        return data, messages
+
+    def iter_grant_pages(self, filter_query=None, page_size=100, max_pages=None):
+        """
+        Fetch grants from the ARC API, yielding one page of records at a time.
+
+        The first page is fetched on its own to learn the total number of
+        pages; the remaining pages are then requested concurrently and
+        yielded in page order. At most MAX_CONCURRENT_REQUESTS pages are
+        fetched ahead of the consumer, so unconsumed pages don't pile up.
+
+        Args:
+            filter_query: Query string for filtering results
+            page_size: Number of results per page (max 1000)
+            max_pages: Maximum number of pages to fetch (None for all)
+
+        Yields:
+            Lists of grant records, one per page
+        """
+        for data in self._iter_page_responses(filter_query, page_size, max_pages):
+            yield data["data"]
+
+    def _iter_page_responses(self, filter_query=None, page_size=100, max_pages=None):
+        """Fetch pages as for iter_grant_pages, yielding each decoded response."""
+        print(f"Fetching data from ARC Grants API...")
+
+        url_prefix = self._build_page_url_prefix(filter_query, page_size)
+        data, messages = self._fetch_page(1, url_prefix)
+        print("\n".join(messages))
+        if data is None:
+            return
+
+        # Work out how many pages remain
+        total_size = data.get("meta", {}).get("total-size", 0)
+        total_pages = data.get("meta", {}).get("total-pages", 1)
+        print(f"Found {total_size} grants across {total_pages} pages")
+
+        last_page = total_pages
+        if not data.get("links", {}).get("next"):
+            last_page = 1
+        elif max_pages and max_pages < last_page:
+            last_page = max_pages
+            print(f"Limiting to maximum requested pages ({max_pages})")
+
+        yield data
+
+        # Fetch the remaining pages concurrently, keeping them in page order
+        pages = range(2, last_page + 1)
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_REQUESTS) as executor:
+            responses = _bounded_map(
+                executor,
+                lambda page: self._fetch_page(page, url_prefix),
+                pages,
+                self.MAX_CONCURRENT_REQUESTS,
+            )
+            try:
+                for page, (data, messages) in zip(pages, responses):
+                    print("\n".join(messages))
+                    if data is None:
+                        # Stop at the first failed page so results stay contiguous
+                        break
+
+                    print(f"Fetched page {page}/{total_pages}")
+                    yield data
+            finally:
+                # Cancel pages that will never be consumed
+                responses.close()
+
     def fetch_grants(self, filter_query=None, page_size=100, max_pages=None):
         """
         Fetch grants from the ARC API with pagination.
@@ -103,192 +385,282 @@ class ARCGrantsAPI:
             List of grant records
         """
         self.results = []
-        page = 1
-        total_pages = None
+        count = 0
 
-        print(f"Fetching data from ARC Grants API...")
+        for data in self._iter_page_responses(filter_query, page_size, max_pages):
+            records = data["data"]
+            if not self.results:
+                # Allocate the whole list once the first page gives the total
+                expected_size = data.get("meta", {}).get("total-size", 0)
+                if max_pages:
+                    expected_size = min(expected_size, max_pages * min(page_size, 1000))
+                self.results = [None] * max(expected_size, len(records))
 
-        while True:
-            # Construct URL manually
-            url = f"{self.BASE_URL}?page%5Bsize%5D={min(page_size, 1000)}&page%5Bnumber%5D={page}"
+            self.results[count : count + len(records)] = records
+            count += len(records)
 
-            if filter_query:
-                # Custom encoding for the filter parameter
-                # Encode only specific characters that need encoding
-                encoded_filter = filter_query.replace(" ", "%20")
-                encoded_filter = encoded_filter.replace('"', "%22")
-                encoded_filter = encoded_filter.replace("(", "%28")
-                encoded_filter = encoded_filter.replace(")", "%29")
-                encoded_filter = encoded_filter.replace("=", "%3D")
-                encoded_filter = encoded_filter.replace(">", "%3E")
-                url = f"{url}&filter={encoded_filter}"
+        # Drop any slots left over if fewer grants arrived than expected
+        del self.results[count:]
 
-            print(f"Request URL: {url}")
+        print(f"Total grants fetched: {len(self.results)}")
+        return self.results
 
-            # Make request with the manually constructed URL
-            try:
-                response = requests.get(url)
-                response.raise_for_status()
-                data = response.json()
-            except requests.RequestException as e:
-                print(f"Error fetching page {page}: {e}")
-                if hasattr(response, "status_code"):
-                    if response.status_code in (401, 403):
-                        print("Authentication error or API access denied.")
-                    elif response.status_code == 500:
-                        print("Server error. Check your query parameters.")
-                        if hasattr(response, "text"):
-                            print(f"Response: {response.text[:500]}...")
-                    else:
-                        print(f"HTTP error: {response.status_code}")
-                break
-
-            # Process results
-            if "data" not in data:
-                print("No data found in response.")
-                print(
-                    f"Response: {json.dumps(data, indent=2)[:500]}..."
-                )  # Print truncated response
-                break
-
-            # Add results to our collection
-            self.results.extend(data["data"])
-
-            # Update pagination info
-            if total_pages is None and "meta" in data:
-                total_pages = data["meta"].get("total-pages", 1)
-                print(
-                    f"Found {data['meta'].get('total-size', 0)} grants across {total_pages} pages"
-                )
+    def export_pages(
+        self, pages, csv_filename=None, sqlite_filename=None, batch_size=10_000
+    ):
+        """
+        Export pages of grant records to CSV and/or SQLite as they arrive.
 
-            # Check if we've reached the end
-            if (
-                "links" not in data
-                or "next" not in data["links"]
-                or not data["links"]["next"]
-            ):
-                print(f"Reached end of results at page {page}")
-                break
+        Records are staged in a temporary JSON Lines file while the schema
+        is inferred across every record, then written to the outputs in a
+        second pass. At most batch_size records are held in memory at a time.
 
-            if max_pages and page >= max_pages:
-                print(f"Reached maximum requested pages ({max_pages})")
-                break
+        Args:
+            pages: Iterable of lists of grant records
+            csv_filename: CSV output filename (None to skip CSV)
+            sqlite_filename: SQLite output filename (None to skip SQLite)
+            batch_size: Maximum number of rows built and inserted at once
 
-            # Move to next page
-            page += 1
-            print(f"Fetching page {page}/{total_pages}...")
+        Returns:
+            True if the export succeeded, False otherwise
+        """
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as staging:
+            schema = {}
+            total = 0
+            for records in pages:
+                self._infer_schema(records, schema)
+                staging.writelines(f"{json_dumps(grant)}\n" for grant in records)
+                total += len(records)
+
+            staging.seek(0)
+            return self._write_exports(
+                map(json_loads, staging),
+                schema,
+                total,
+                csv_filename=csv_filename,
+                sqlite_filename=sqlite_filename,
+                batch_size=batch_size,
+            )
+
+    def _write_exports(
+        self,
+        records,
+        schema,
+        total,
+        csv_filename=None,
+        sqlite_filename=None,
+        batch_size=10_000,
+    ):
+        """
+        Write grant records to CSV and/or SQLite in batches.
 
-        print(f"Total grants fetched: {len(self.results)}")
-        return self.results
+        Args:
+            records: Iterable of grant records
+            schema: Dict mapping attribute names to column types, from
+                _infer_schema over the same records
+            total: Number of records
+            csv_filename: CSV output filename (None to skip CSV)
+            sqlite_filename: SQLite output filename (None to skip SQLite)
+            batch_size: Maximum number of rows built and inserted at once
 
-    def export_to_csv(self, filename):
-        """Export results to CSV file."""
-        if not self.results:
+        Returns:
+            True if the export succeeded, False otherwise
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+
+        if not total:
             print("No results to export.")
             return False
 
+        sorted_fields = sorted(schema)
+        build_row = _row_builder(sorted_fields)
+
+        csvfile = None
+        conn = None
+        pool = None
+        exported = 0
+
         try:
-            with open(filename, "w", newline="", encoding="utf-8") as csvfile:
-                # Extract all possible field names from all records
-                fieldnames = set()
-                for grant in self.results:
-                    if "attributes" in grant:
-                        fieldnames.update(grant["attributes"].keys())
+            if csv_filename:
+                # Use a 1 MiB buffer to cut down on write syscalls
+                csvfile = open(
+                    csv_filename,
+                    "w",
+                    newline="",
+                    encoding="utf-8",
+                    buffering=1 << 20,
+                )
+                writer = csv.writer(csvfile)
+                writer.writerow(["id"] + sorted_fields)
 
-                fieldnames = sorted(list(fieldnames))
-                fieldnames = ["id"] + fieldnames  # Add the ID field first
+            if sqlite_filename:
+                conn, sql = self._create_sqlite_table(sqlite_filename, schema)
+                cursor = conn.cursor()
 
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
+                # Insert all records in one transaction
+                conn.execute("BEGIN")
 
-                for grant in self.results:
-                    row = {"id": grant.get("id", "")}
+            if (
+                csvfile
+                and not conn
+                and total >= self.CSV_POOL_THRESHOLD
+                and (os.cpu_count() or 1) > 1
+            ):
+                # CSV serialization is CPU-bound, so spread large exports
+                # across processes when the rows aren't needed for SQLite
+                # and there is more than one CPU to run them on. At most
+                # batch_size records are in flight at once.
+                pool = ProcessPoolExecutor()
+                chunk_size = min(self.CSV_POOL_CHUNK_SIZE, batch_size)
+                chunks = itertools.batched(records, chunk_size)
+                for text in _bounded_map(
+                    pool,
+                    functools.partial(_serialize_chunk, sorted_fields),
+                    chunks,
+                    max(1, batch_size // chunk_size),
+                ):
+                    csvfile.write(text)
+                exported = total
+            else:
+                for batch in itertools.batched(records, batch_size):
+                    # Serialize each grant once and feed the same rows to both outputs
+                    rows = list(map(build_row, batch))
+
+                    if csvfile:
+                        writer.writerows(rows)
 
-                    if "attributes" in grant:
-                        for key, value in grant["attributes"].items():
-                            # Convert lists and dictionaries to JSON strings
-                            if isinstance(value, (list, dict)):
-                                row[key] = json.dumps(value)
-                            else:
-                                row[key] = value
+                    if conn:
+                        cursor.executemany(sql, rows)
 
-                    writer.writerow(row)
+                    exported += len(batch)
 
-            print(f"Exported {len(self.results)} grants to {filename}")
-            return True
+            if conn:
+                conn.commit()
 
         except Exception as e:
-            print(f"Error exporting to CSV: {e}")
+            print(f"Error exporting results: {e}")
             return False
 
-    def export_to_sqlite(self, filename):
-        """Export results to SQLite database."""
-        if not self.results:
-            print("No results to export.")
-            return False
+        finally:
+            if pool:
+                pool.shutdown()
+            if csvfile:
+                csvfile.close()
+            if conn:
+                conn.close()
+
+        if csv_filename:
+            print(f"Exported {exported} grants to {csv_filename}")
+        if sqlite_filename:
+            print(f"Exported {exported} grants to SQLite database: {sqlite_filename}")
+        return True
+
+    def _infer_schema(self, records, schema=None):
+        """
+        Collect field names and SQLite column types in a single pass.
 
-        try:
-            # Create or connect to database
-            conn = sqlite3.connect(filename)
-            cursor = conn.cursor()
-
-            # Determine schema from the first record
-            fieldnames = set()
-            for grant in self.results:
-                if "attributes" in grant:
-                    fieldnames.update(grant["attributes"].keys())
-
-            # Create table
-            fields = ["id TEXT PRIMARY KEY"]
-            for field in sorted(fieldnames):
-                # Guess field type based on first non-null value
-                field_type = "TEXT"
-                for grant in self.results:
-                    if "attributes" in grant and field in grant["attributes"]:
-                        value = grant["attributes"][field]
-                        if value is not None:
-                            if isinstance(value, (int, float)):
-                                field_type = "REAL"
-                                break
-
-                # SQLite column names can't contain hyphens
-                safe_field = field.replace("-", "_")
-                fields.append(f"{safe_field} {field_type}")
-
-            # Drop table if it exists and create new one
-            cursor.execute("DROP TABLE IF EXISTS grants")
-            cursor.execute(f"CREATE TABLE grants ({', '.join(fields)})")
-
-            # Insert data
-            for grant in self.results:
-                values = {"id": grant.get("id", "")}
-
-                if "attributes" in grant:
-                    for key, value in grant["attributes"].items():
-                        # Convert lists and dictionaries to JSON strings
-                        if isinstance(value, (list, dict)):
-                            values[key.replace("-", "_")] = json.dumps(value)
-                        else:
-                            values[key.replace("-", "_")] = value
-
-                # Prepare placeholders for query
-                placeholders = ", ".join(["?" for _ in range(len(values))])
-                columns = ", ".join([f"`{col}`" for col in values.keys()])
-
-                cursor.execute(
-                    f"INSERT INTO grants ({columns}) VALUES ({placeholders})",
-                    list(values.values()),
-                )
+        A field's type is decided by its first non-null value: REAL if
+        numeric, otherwise TEXT. Fields that are only ever null are marked
+        None, so a later call can still type them, and are created as TEXT.
 
-            conn.commit()
-            conn.close()
+        Args:
+            records: Iterable of grant records
+            schema: Schema from a previous call to extend (None to start afresh)
 
-            print(f"Exported {len(self.results)} grants to SQLite database: {filename}")
-            return True
+        Returns:
+            Dict mapping each attribute name to its column type
+        """
+        if schema is None:
+            schema = {}
+        for grant in records:
+            for key, value in grant.get("attributes", {}).items():
+                if value is None:
+                    schema.setdefault(key, None)
+                elif schema.get(key) is None:
+                    schema[key] = (
+                        "REAL"
+                        if isinstance(value, (int, float))
+                        and not isinstance(value, bool)
+                        else "TEXT"
+                    )
+        return schema
+
+    def _create_sqlite_table(self, filename, schema):
+        """
+        Create the grants table in a fresh SQLite connection.
+
+        Args:
+            filename: SQLite database filename
+            schema: Dict mapping attribute names to column types
+
+        Returns:
+            Tuple of the open SQLite connection and the INSERT statement
+            covering every column, in schema order
+        """
+        # Create or connect to database
+        conn = sqlite3.connect(filename)
+
+        # The export is write-once and can simply be re-run, so trade
+        # crash durability for fewer journal writes and fsyncs
+        for pragma in (
+            "journal_mode=MEMORY",
+            "synchronous=OFF",
+            "temp_store=MEMORY",
+            "locking_mode=EXCLUSIVE",
+            "cache_size=-20000",
+        ):
+            conn.execute(f"PRAGMA {pragma}")
+
+        # Quote every column name once; SQLite column names can't contain hyphens
+        sorted_fields = sorted(schema)
+        columns = ["`id`"] + [f"`{field.replace('-', '_')}`" for field in sorted_fields]
+        # Fields that were only ever null default to TEXT
+        types = ["TEXT PRIMARY KEY"] + [
+            schema[field] or "TEXT" for field in sorted_fields
+        ]
+
+        # Drop table if it exists and create new one
+        fields = [
+            f"{column} {field_type}" for column, field_type in zip(columns, types)
+        ]
+        conn.execute("DROP TABLE IF EXISTS grants")
+        conn.execute(f"CREATE TABLE grants ({', '.join(fields)})")
+
+        # Build a single INSERT covering every column (NULL for missing)
+        insert_sql = (
+            f"INSERT INTO grants ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['?'] * len(columns))})"
+        )
+
+        return conn, insert_sql
+
+    def export_to_csv(self, filename):
+        """Export results to CSV file."""
+        return self._write_exports(
+            self.results,
+            self._infer_schema(self.results),
+            len(self.results),
+            csv_filename=filename,
+        )
+
+    def export_to_sqlite(self, filename, batch_size=10_000):
+        """Export results to SQLite database."""
+        return self._write_exports(
+            self.results,
+            self._infer_schema(self.results),
+            len(self.results),
+            sqlite_filename=filename,
+            batch_size=batch_size,
+        )
 
-        except Exception as e:
-            print(f"Error exporting to SQLite: {e}")
-            return False
+
+def positive_int(value):
+    """Argparse type for integers of at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
 
 def main():
@@ -338,9 +710,28 @@ def main():
         "--max-pages", type=int, help="Maximum number of pages to fetch"
     )
 
+    # Cache options
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always fetch from the API instead of using cached responses",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=positive_int,
+        default=86400,
+        help="Number of seconds to reuse cached API responses for",
+    )
+
     # Output options
     parser.add_argument("--csv", help="CSV output filename")
     parser.add_argument("--sqlite", help="SQLite output filename")
+    parser.add_argument(
+        "--batch-size",
+        type=positive_int,
+        default=10_000,
+        help="Number of rows written to the CSV and SQLite outputs per batch",
+    )
 
     # Debugging option
     parser.add_argument("--debug", action="store_true", help="Show debug information")
@@ -350,53 +741,52 @@ def main():
     # Create timestamp for default filenames
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    # Set default output filenames if not specified
+    # Only write the requested outputs, defaulting to CSV
     if not args.csv and not args.sqlite:
         args.csv = f"results/arc_grants_{timestamp}.csv"
 
-    if not args.sqlite and args.csv:
-        args.sqlite = args.csv.replace(".csv", ".db")
-
-    if not args.csv and args.sqlite:
-        args.csv = args.sqlite.replace(".db", ".csv")
-
     # Create API client
-    api = ARCGrantsAPI()
-
-    # Build filter query
-    filter_query = api.build_filter_query(
-        search_text=args.search,
-        scheme=args.scheme,
-        admin_org=args.admin_org,
-        admin_org_short=args.admin_org_short,
-        status=args.status,
-        year_from=args.year_from,
-        year_to=args.year_to,
-        funding_from=args.funding_from,
-        funding_to=args.funding_to,
-        fellowships_only=args.fellowships_only,
-        lief_register=args.lief_register,
-        four_digit_for=args.four_digit_for,
-        two_digit_for=args.two_digit_for,
-    )
-
-    # Fetch data
-    if filter_query:
-        print(f"Using filter query: {filter_query}")
-    else:
-        print("No filters applied - fetching all grants")
-
-    api.fetch_grants(
-        filter_query=filter_query, page_size=args.page_size, max_pages=args.max_pages
-    )
-
-    # Export results
-    if api.results:
-        api.export_to_csv(args.csv)
-        api.export_to_sqlite(args.sqlite)
-        print(f"Export complete. Files saved as {args.csv} and {args.sqlite}")
-    else:
-        print("No results found. Nothing exported.")
+    with ARCGrantsAPI(use_cache=not args.no_cache, cache_ttl=args.cache_ttl) as api:
+        # Build filter query
+        filter_query = api.build_filter_query(
+            search_text=args.search,
+            scheme=args.scheme,
+            admin_org=args.admin_org,
+            admin_org_short=args.admin_org_short,
+            status=args.status,
+            year_from=args.year_from,
+            year_to=args.year_to,
+            funding_from=args.funding_from,
+            funding_to=args.funding_to,
+            fellowships_only=args.fellowships_only,
+            lief_register=args.lief_register,
+            four_digit_for=args.four_digit_for,
+            two_digit_for=args.two_digit_for,
+        )
+
+        # Fetch data
+        if filter_query:
+            print(f"Using filter query: {filter_query}")
+        else:
+            print("No filters applied - fetching all grants")
+
+        pages = api.iter_grant_pages(
+            filter_query=filter_query,
+            page_size=args.page_size,
+            max_pages=args.max_pages,
+        )
+
+        # Export results page by page as they are fetched
+        if api.export_pages(
+            pages,
+            csv_filename=args.csv,
+            sqlite_filename=args.sqlite,
+            batch_size=args.batch_size,
+        ):
+            filenames = [f for f in (args.csv, args.sqlite) if f]
+            print(f"Export complete. Files saved as {' and '.join(filenames)}")
+        else:
+            print("Nothing exported.")
 
 
 if __name__ == "__main__":